@@ -0,0 +1,67 @@
+"""Measure cold-start cost: app import time, OpenAI client creation and the first /chat request.
+
+Each run is a fresh interpreter so nothing is cached between measurements. The first
+request goes through the full app with the deterministic stand-in from `replay_eval`,
+so it measures our own first-request overhead rather than OpenAI latency.
+
+    python -m benchmarks.cold_start --runs 5 --max-import-ms 800
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_PROBE = """
+import json, time
+started = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+from src import service
+service.get_client()
+client_created = time.perf_counter()
+
+from fastapi.testclient import TestClient
+from benchmarks.replay_eval import ReplayLLM
+service.client = ReplayLLM(
+    service.MentorService.get_characters(), service.BIO_CONDENSE_PROMPT, service.BIO_CONDENSE_TOKENS // 2
+)
+test_client = TestClient(src.main.app)
+request_started = time.perf_counter()
+test_client.post("/chat", json={"character": "mentor", "message": "Hi, my name is Sam"})
+request_finished = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "client_ms": (client_created - imported) * 1000,
+    "first_request_ms": (request_finished - request_started) * 1000,
+}))
+"""
+
+
+def probe() -> dict:
+    """Run one cold start in a fresh interpreter"""
+    env = {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "cold-start"), "LOG_LEVEL": "WARNING"}
+    output = subprocess.run([sys.executable, "-c", _PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="exit non-zero if median import time exceeds this")
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    medians = {metric: statistics.median(run[metric] for run in runs) for metric in runs[0]}
+    for metric, value in medians.items():
+        print(f"{metric:<18} median={value:8.1f}ms")
+
+    if args.max_import_ms is not None and medians["import_ms"] > args.max_import_ms:
+        sys.exit(f"Import time {medians['import_ms']:.1f}ms exceeds budget of {args.max_import_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
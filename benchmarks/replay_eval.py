@@ -0,0 +1,341 @@
+"""Replay recorded transcripts through the profiling and recommendation pipelines offline.
+
+Each session's user messages are sent through `MentorService.chat_with_character` and
+`get_character_recommendations` against a deterministic local stand-in for OpenAI, in
+parallel worker processes, and the run reports LLM calls and tokens per session, wall
+time, trait-score convergence and recommendation stability.
+
+Input is NDJSON, one session per line, in the `/sessions/export` format
+(`{"session_id", "conversation": [{"role", "content"}]}`) or as
+`{"session_id", "character", "messages": ["...", ...]}`.
+
+    python -m benchmarks.replay_eval sessions.ndjson --workers 4 --llm-latency 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import statistics
+import time
+import types
+from collections import Counter
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional
+
+_WORD = re.compile(r"[a-z']+")
+
+# Keywords nudging each trait towards its left (low) or right (high) end
+TRAIT_KEYWORDS = {
+    "energy_social_drive": (
+        ["alone", "quiet", "reading", "introvert", "myself"],
+        ["friends", "party", "team", "people", "talk"],
+    ),
+    "information_style": (
+        ["facts", "practical", "hands", "details", "real"],
+        ["ideas", "imagine", "theory", "future", "why"],
+    ),
+    "decision_lens": (["logic", "analyze", "data", "numbers", "reason"], ["feel", "care", "people", "values", "help"]),
+    "structure_preference": (
+        ["flexible", "spontaneous", "whatever", "random", "improvise"],
+        ["plan", "schedule", "organized", "list", "routine"],
+    ),
+    "emotional_stability": (
+        ["calm", "relaxed", "fine", "okay", "chill"],
+        ["stressed", "anxious", "worried", "angry", "upset"],
+    ),
+    "risk_ambition": (
+        ["safe", "stable", "content", "careful", "secure"],
+        ["ambitious", "risk", "startup", "big", "win"],
+    ),
+    "cooperation_style": (["compete", "win", "best", "beat", "rank"], ["support", "help", "together", "share", "kind"]),
+    "focus_lens": (
+        ["vision", "overall", "big", "future", "picture"],
+        ["detail", "precise", "exact", "careful", "small"],
+    ),
+    "pace_decisiveness": (
+        ["think", "consider", "slowly", "research", "wait"],
+        ["quick", "fast", "now", "decide", "immediately"],
+    ),
+    "control_autonomy": (
+        ["delegate", "guidance", "told", "follow", "help"],
+        ["myself", "independent", "control", "own", "lead"],
+    ),
+}
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _stable_hash(text: str) -> int:
+    # hash() is salted per process, which would make runs differ across workers
+    return int(hashlib.sha1(text.encode()).hexdigest()[:8], 16)
+
+
+def _estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+class ReplayLLM:
+    """Deterministic stand-in for the OpenAI client: same inputs, same outputs, no network"""
+
+    def __init__(
+        self, characters: List[Dict[str, str]], condense_prompt: str, condense_words: int, latency: float = 0.0
+    ):
+        self.characters = [char for char in characters if char["id"] != "mentor"]
+        self.condense_prompt = condense_prompt
+        self.condense_words = condense_words
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    def reset_usage(self):
+        self.calls.clear()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def create(self, model: str, messages: List[Dict[str, str]], response_format: Optional[Dict] = None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        if response_format:
+            kind = response_format["json_schema"]["name"]
+        elif messages[0]["content"] == self.condense_prompt:
+            kind = "bio_condense"
+        else:
+            kind = "completion"
+
+        if kind == "profile_analysis":
+            content = json.dumps(self._analyze(messages[-1]["content"]))
+        elif kind == "character_recommendations":
+            content = json.dumps(self._recommend(messages[0]["content"]))
+        elif kind == "bio_condense":
+            content = self._condense(messages[-1]["content"])
+        else:
+            content = self._reply(messages)
+
+        prompt_tokens = sum(_estimate_tokens(message["content"]) for message in messages)
+        completion_tokens = _estimate_tokens(content)
+        self.calls[kind] += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        message = types.SimpleNamespace(content=content)
+        usage = types.SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+    def _analyze(self, prompt: str) -> Dict:
+        user_lines = [line[len("User: ") :] for line in prompt.splitlines() if line.startswith("User: ")]
+        words = Counter(word for line in user_lines for word in _words(line))
+
+        updates = {}
+        for trait, (left, right) in TRAIT_KEYWORDS.items():
+            left_hits = sum(words[word] for word in left)
+            right_hits = sum(words[word] for word in right)
+            if left_hits or right_hits:
+                score = max(1.0, min(10.0, 5.0 + 1.5 * (right_hits - left_hits)))
+                hits = [word for word in left + right if words[word]]
+                updates[trait] = {"score": score, "evidence": f"mentions {', '.join(hits)}"}
+
+        name = None
+        bio = None
+        for line in user_lines:
+            match = re.search(r"\bmy name is (\w+)", line, re.IGNORECASE)
+            if match and not name:
+                name = match.group(1).title()
+            if re.search(r"\bI (like|love|enjoy|want)\b", line, re.IGNORECASE):
+                bio = line.strip()
+
+        return {
+            "has_updates": bool(updates or name or bio),
+            "basic_profile": {"name": name, "bio": bio},
+            "personality_updates": {trait: updates.get(trait) for trait in TRAIT_KEYWORDS},
+        }
+
+    def _recommend(self, system_prompt: str) -> Dict:
+        history = system_prompt.split("Available Characters:")[0]
+        words = set(_words(history))
+
+        def relevance(char: Dict[str, str]):
+            overlap = len(words & set(_words(f"{char['name']} {char['description']}")))
+            return -overlap, _stable_hash(char["id"] + history)
+
+        ranked = sorted(self.characters, key=relevance)[:5]
+        return {
+            "recommended_characters": [
+                {"character_id": char["id"], "reasoning": f"Matches interest in {char['description'].lower()}"}
+                for char in ranked
+            ]
+        }
+
+    def _condense(self, bio: str) -> str:
+        # Drop repeated sentences, then keep as many words as the prompt allows
+        sentences = list(dict.fromkeys(s.strip() for s in re.split(r"(?<=[.!?])\s+", bio) if s.strip()))
+        return " ".join(" ".join(sentences).split()[: self.condense_words])
+
+    def _reply(self, messages: List[Dict[str, str]]) -> str:
+        last_user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        topic = " ".join(_words(last_user)[:6]) or "that"
+        openers = ["Tell me more about", "What draws you to", "How do you feel about", "What's next for"]
+        return f"{openers[_stable_hash(last_user) % len(openers)]} {topic}?"
+
+
+def load_sessions(path: str) -> Iterator[Dict]:
+    """Yield {"session_id", "character", "messages"} for each transcript in an NDJSON file"""
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "conversation" in record:
+                messages = [m["content"] for m in record["conversation"] if m.get("role") == "user"]
+            else:
+                messages = record.get("messages", [])
+            if messages:
+                yield {
+                    "session_id": str(record.get("session_id", f"line-{line_number}")),
+                    "character": record.get("character", "mentor"),
+                    "messages": messages,
+                }
+
+
+_llm: Optional[ReplayLLM] = None
+
+
+def _init_worker(llm_latency: float):
+    global _llm
+    # Replays run in isolated process-local state with every optional cache off. There is no
+    # event loop here, so bio condensing runs inline on the turn that triggers it (see
+    # MentorService._schedule_bio_condense) and the call counts don't depend on timing
+    os.environ["STATE_BACKEND"] = "memory"
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("OPENAI_API_KEY", "replay")
+    logging.disable(logging.INFO)
+
+    from src import service
+
+    _llm = ReplayLLM(
+        service.MentorService.get_characters(),
+        service.BIO_CONDENSE_PROMPT,
+        service.BIO_CONDENSE_TOKENS // 2,
+        latency=llm_latency,
+    )
+    service.client = _llm
+
+
+def _jaccard(a: List[str], b: List[str]) -> float:
+    return len(set(a) & set(b)) / len(set(a) | set(b)) if a or b else 1.0
+
+
+def replay_session(session: Dict, recommend_every: int) -> Dict:
+    """Replay one transcript and measure its cost and how settled its outputs are"""
+    from src.service import MentorService
+
+    _llm.reset_usage()
+    session_id = session["session_id"]
+    MentorService.reset_demo(session_id)
+
+    score_history = []
+    recommendation_history = []
+    started = time.perf_counter()
+    for turn, message in enumerate(session["messages"], 1):
+        MentorService.chat_with_character(session["character"], message, session_id)
+        score_history.append(MentorService.get_profile(session_id)["personality_scores"])
+        if turn % recommend_every == 0 or turn == len(session["messages"]):
+            recommendations = MentorService.get_character_recommendations(session_id)
+            recommendation_history.append([rec["character_id"] for rec in recommendations])
+    wall_time = time.perf_counter() - started
+
+    # Convergence: how much the scores still moved on the final turn (0 means settled)
+    final_score_delta = 0.0
+    if len(score_history) > 1:
+        final_score_delta = statistics.mean(
+            abs(score_history[-1][trait] - score_history[-2][trait]) for trait in score_history[-1]
+        )
+    # Stability: overlap between consecutive recommendation sets (1 means unchanged)
+    stability = [_jaccard(a, b) for a, b in zip(recommendation_history, recommendation_history[1:])]
+
+    return {
+        "session_id": session_id,
+        "turns": len(session["messages"]),
+        "llm_calls": dict(_llm.calls),
+        "prompt_tokens": _llm.prompt_tokens,
+        "completion_tokens": _llm.completion_tokens,
+        "wall_time": wall_time,
+        "final_score_delta": final_score_delta,
+        "recommendation_stability": statistics.mean(stability) if stability else 1.0,
+    }
+
+
+def _replay(args) -> Dict:
+    return replay_session(*args)
+
+
+def summarize(results: List[Dict], elapsed: float) -> Dict:
+    """Aggregate per-session results into the run report"""
+    calls_per_session = Counter()
+    for result in results:
+        calls_per_session.update(result["llm_calls"])
+    wall_times = sorted(result["wall_time"] for result in results)
+    sessions = len(results)
+    return {
+        "sessions": sessions,
+        "turns": sum(result["turns"] for result in results),
+        "elapsed": elapsed,
+        "sessions_per_second": sessions / elapsed if elapsed else 0.0,
+        "llm_calls_per_session": {kind: count / sessions for kind, count in sorted(calls_per_session.items())},
+        "prompt_tokens_per_session": statistics.mean(result["prompt_tokens"] for result in results),
+        "completion_tokens_per_session": statistics.mean(result["completion_tokens"] for result in results),
+        "wall_time_per_session": {
+            "mean": statistics.mean(wall_times),
+            "p95": wall_times[min(sessions - 1, int(sessions * 0.95))],
+        },
+        "final_score_delta": statistics.mean(result["final_score_delta"] for result in results),
+        "recommendation_stability": statistics.mean(result["recommendation_stability"] for result in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("transcripts", help="NDJSON file of recorded sessions")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds slept per stand-in LLM call")
+    parser.add_argument("--recommend-every", type=int, default=1, help="request recommendations every N turns")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    sessions = list(load_sessions(args.transcripts))
+    if not sessions:
+        parser.error(f"No transcripts with user messages in {args.transcripts}")
+
+    started = time.perf_counter()
+    with Pool(args.workers, initializer=_init_worker, initargs=(args.llm_latency,)) as pool:
+        results = list(pool.imap_unordered(_replay, [(session, args.recommend_every) for session in sessions]))
+    report = summarize(results, time.perf_counter() - started)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(
+        f"sessions={report['sessions']} turns={report['turns']} elapsed={report['elapsed']:.2f}s "
+        f"({report['sessions_per_second']:.1f} sessions/s)"
+    )
+    calls = ", ".join(f"{kind}={count:.1f}" for kind, count in report["llm_calls_per_session"].items())
+    print(f"LLM calls/session: {calls}")
+    print(
+        f"tokens/session: prompt={report['prompt_tokens_per_session']:.0f} "
+        f"completion={report['completion_tokens_per_session']:.0f}"
+    )
+    print(
+        f"wall time/session: mean={report['wall_time_per_session']['mean']:.3f}s "
+        f"p95={report['wall_time_per_session']['p95']:.3f}s"
+    )
+    print(f"final-turn trait score delta: {report['final_score_delta']:.3f}")
+    print(f"recommendation stability (Jaccard): {report['recommendation_stability']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure chat-turn throughput across worker processes sharing one SQLite state backend.
+
+Each simulated turn does the same state operations as `MentorService.chat_with_character`
+(append user message, update profile, append assistant message) with a sleep standing in
+for the LLM calls, so the numbers show how far the shared backend lets workers scale.
+
+    python -m benchmarks.state_backend_throughput --workers 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from src.state import SessionState, SQLiteStateBackend
+
+
+def _run_worker(db_path: str, worker_index: int, turns: int, sessions: int, llm_latency: float) -> int:
+    backend = SQLiteStateBackend(db_path)
+    for turn in range(turns):
+        # Spread turns over shared sessions so workers genuinely contend on versions
+        session_id = f"session-{(worker_index + turn) % sessions}"
+        backend.update(session_id, lambda s: s.conversation.append({"role": "user", "content": f"turn {turn}"}))
+        time.sleep(llm_latency)
+
+        def record_turn(session: SessionState):
+            session.profile["last_update_message_count"] = len(session.conversation)
+            session.conversation.append({"role": "assistant", "content": f"reply {turn}"})
+
+        backend.update(session_id, record_turn)
+    return turns
+
+
+def run(workers: int, turns: int, sessions: int, llm_latency: float) -> float:
+    """Return completed turns per second for the given number of worker processes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        SQLiteStateBackend(db_path)  # Create the schema before workers race for it
+        started = time.perf_counter()
+        with multiprocessing.Pool(workers) as pool:
+            completed = sum(
+                pool.starmap(_run_worker, [(db_path, i, turns, sessions, llm_latency) for i in range(workers)])
+            )
+        elapsed = time.perf_counter() - started
+        conversation_lengths = [
+            len(SQLiteStateBackend(db_path).load(f"session-{i}").conversation) for i in range(sessions)
+        ]
+    # Every turn writes exactly two messages; anything else means a lost update
+    assert sum(conversation_lengths) == completed * 2, "lost update detected"
+    return completed / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--turns", type=int, default=200, help="turns per worker")
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.01, help="seconds slept per turn")
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        throughput = run(workers, args.turns, args.sessions, args.llm_latency)
+        baseline = baseline or throughput
+        print(f"workers={workers:<3} turns/s={throughput:8.1f}  speedup={throughput / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Deque, Dict, Optional
+
+from .tracing import span
+
+
+class Priority(IntEnum):
+    """Lower values are admitted first"""
+
+    INTERACTIVE = 0  # A user is waiting on the reply (/chat)
+    BACKGROUND = 1  # Recommendations and profile refreshes
+
+
+class AdmissionRejected(Exception):
+    """Raised when the expected queue wait would exceed the SLO"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Server busy, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class AdmissionMetrics:
+    """Counters and recent wait times for the admission controller"""
+
+    def __init__(self, window: int = 1000):
+        self.admitted: Dict[str, int] = {priority.name.lower(): 0 for priority in Priority}
+        self.rejected: Dict[str, int] = {priority.name.lower(): 0 for priority in Priority}
+        self.wait_times: Deque[float] = deque(maxlen=window)
+
+    def record_wait(self, priority: Priority, wait: float):
+        self.admitted[priority.name.lower()] += 1
+        self.wait_times.append(wait)
+
+    def record_rejection(self, priority: Priority):
+        self.rejected[priority.name.lower()] += 1
+
+    def wait_summary(self) -> Dict[str, float]:
+        """p50/p95/max of recent queue waits in seconds"""
+        if not self.wait_times:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        waits = sorted(self.wait_times)
+        return {
+            "p50": waits[len(waits) // 2],
+            "p95": waits[min(len(waits) - 1, math.ceil(len(waits) * 0.95) - 1)],
+            "max": waits[-1],
+        }
+
+
+class AdmissionController:
+    """Caps concurrent LLM-bound requests with per-session fair queues.
+
+    Waiting requests are served strictly by priority, and round-robin across
+    sessions within a priority so one busy session can't starve the others.
+    A request whose estimated wait exceeds `slo_seconds` is rejected up front.
+    """
+
+    def __init__(self, max_in_flight: int, slo_seconds: float, initial_service_time: float = 3.0):
+        self.max_in_flight = max_in_flight
+        self.slo_seconds = slo_seconds
+        self.metrics = AdmissionMetrics()
+        self._in_flight = 0
+        # Exponentially weighted average of how long an admitted request holds its slot
+        self._service_time = initial_service_time
+        self._queues: Dict[Priority, "OrderedDict[str, Deque[asyncio.Future]]"] = {
+            priority: OrderedDict() for priority in Priority
+        }
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        """Number of waiting requests, optionally for a single priority"""
+        priorities = [priority] if priority is not None else list(Priority)
+        return sum(len(waiters) for p in priorities for waiters in self._queues[p].values())
+
+    def estimated_wait(self, priority: Priority) -> float:
+        """Expected seconds a new request at this priority would queue for"""
+        ahead = sum(self.queue_depth(p) for p in Priority if p <= priority)
+        if ahead == 0 and self._in_flight < self.max_in_flight:
+            return 0.0
+        return (ahead + 1) / self.max_in_flight * self._service_time
+
+    @asynccontextmanager
+    async def admit(self, session_id: str, priority: Priority = Priority.INTERACTIVE):
+        """Hold an in-flight slot for the duration of the block"""
+        estimated_wait = self.estimated_wait(priority)
+        if estimated_wait > self.slo_seconds:
+            self.metrics.record_rejection(priority)
+            raise AdmissionRejected(retry_after=max(1.0, estimated_wait - self.slo_seconds))
+
+        enqueued_at = time.monotonic()
+        if self._in_flight < self.max_in_flight and self.queue_depth() == 0:
+            self._in_flight += 1
+        else:
+            with span("admission_wait"):
+                await self._wait_for_slot(session_id, priority)
+        self.metrics.record_wait(priority, time.monotonic() - enqueued_at)
+
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started_at)
+            self._release()
+
+    async def _wait_for_slot(self, session_id: str, priority: Priority):
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(session_id, deque()).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the client went away
+                self._release()
+            else:
+                self._discard(session_id, priority, waiter)
+            raise
+
+    def _discard(self, session_id: str, priority: Priority, waiter: asyncio.Future):
+        waiters = self._queues[priority].get(session_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._queues[priority][session_id]
+
+    def _release(self):
+        self._in_flight -= 1
+        while self._in_flight < self.max_in_flight:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for priority in Priority:
+            sessions = self._queues[priority]
+            while sessions:
+                # Take the head of the oldest session, then move that session to the back
+                session_id, waiters = sessions.popitem(last=False)
+                waiter = waiters.popleft()
+                if waiters:
+                    sessions[session_id] = waiters
+                if not waiter.done():
+                    return waiter
+        return None
+
+    def snapshot(self) -> Dict:
+        """Current queue state and metrics"""
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": {priority.name.lower(): self.queue_depth(priority) for priority in Priority},
+            "estimated_service_time": self._service_time,
+            "admitted": dict(self.metrics.admitted),
+            "rejected": dict(self.metrics.rejected),
+            "wait_seconds": self.metrics.wait_summary(),
+        }
+
+
+# Per-process controller; with several workers the effective cap is workers * max_in_flight
+admission_controller = AdmissionController(
+    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16")),
+    slo_seconds=float(os.getenv("ADMISSION_SLO_SECONDS", "10")),
+)
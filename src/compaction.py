@@ -0,0 +1,102 @@
+import os
+import re
+from typing import List, Optional
+
+# Hard cap on the bio interpolated into every analyzer prompt
+BIO_MAX_TOKENS = int(os.getenv("PROFILE_BIO_MAX_TOKENS", "120"))
+# Once the bio grows past this, an LLM pass condenses it in the background
+BIO_CONDENSE_TOKENS = int(os.getenv("PROFILE_BIO_CONDENSE_TOKENS", "80"))
+# Cap on a single piece of trait evidence
+EVIDENCE_MAX_TOKENS = 60
+# Maximum pieces of evidence kept per trait
+EVIDENCE_PER_TRAIT = 3
+# Word-set overlap above which two fragments are treated as the same information
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Prefix stored on every piece of trait evidence
+EVIDENCE_PREFIX = "From conversation: "
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[a-z0-9']+")
+_NEGATIONS = {"not", "no", "never", "nor", "neither", "none", "nothing", "nobody", "cannot", "without"}
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting"""
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Trim text to roughly max_tokens, cutting at a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    truncated = text[: max_tokens * 4].rsplit(" ", 1)[0]
+    return truncated.rstrip(" ,;.") + "..."
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _contains_words(words: List[str], part: List[str]) -> bool:
+    """Whether `part` appears as a contiguous run of whole words in `words`"""
+    return any(words[i : i + len(part)] == part for i in range(len(words) - len(part) + 1))
+
+
+def _changes_meaning(word: str) -> bool:
+    """Words whose presence in only one fragment makes it a different fact (numbers, negations)"""
+    return any(char.isdigit() for char in word) or word in _NEGATIONS or word.endswith("n't")
+
+
+def is_near_duplicate(a: str, b: str) -> bool:
+    """Whether two fragments carry the same information, ignoring case, punctuation and word order.
+
+    Fragments differing in a number ("I am 16" / "I am 61") or a negation ("wants to" /
+    "does not want to") are different facts. Otherwise, one fragment repeating the other's
+    words in sequence counts as a duplicate, as do heavily overlapping word sets.
+    """
+    words_a, words_b = _words(a), _words(b)
+    if not words_a or not words_b:
+        return words_a == words_b
+    set_a, set_b = set(words_a), set(words_b)
+    if any(_changes_meaning(word) for word in set_a ^ set_b):
+        return False
+    if _contains_words(words_a, words_b) or _contains_words(words_b, words_a):
+        return True
+    return len(set_a & set_b) / len(set_a | set_b) >= NEAR_DUPLICATE_THRESHOLD
+
+
+def split_bio(bio: Optional[str]) -> List[str]:
+    """Split a bio into its sentence-level fragments"""
+    if not bio:
+        return []
+    return [fragment.strip().rstrip(".") for fragment in _SENTENCE_SPLIT.split(bio) if fragment.strip(" .")]
+
+
+def merge_bio(bio: Optional[str], new_bio: str, max_tokens: int = BIO_MAX_TOKENS) -> str:
+    """Add new bio information, replacing near-duplicates and dropping the oldest fragments to stay under max_tokens"""
+    fragments = split_bio(bio)
+    for new_fragment in split_bio(new_bio):
+        duplicate_of = next(
+            (i for i, fragment in enumerate(fragments) if is_near_duplicate(fragment, new_fragment)), None
+        )
+        if duplicate_of is None:
+            fragments.append(new_fragment)
+        else:
+            # The newer wording of the same fact wins, so a short correction isn't lost
+            fragments[duplicate_of] = new_fragment
+
+    while len(fragments) > 1 and estimate_tokens(". ".join(fragments)) > max_tokens:
+        fragments.pop(0)
+
+    return truncate_to_tokens(". ".join(fragments), max_tokens)
+
+
+def add_evidence(evidence: List[str], new_evidence: str) -> List[str]:
+    """Append a piece of trait evidence (stored with EVIDENCE_PREFIX) unless an existing entry says the same thing"""
+    new_evidence = truncate_to_tokens(new_evidence, EVIDENCE_MAX_TOKENS)
+    # Compare without the shared prefix, which would otherwise make every pair look alike
+    if any(is_near_duplicate(existing.removeprefix(EVIDENCE_PREFIX), new_evidence) for existing in evidence):
+        return evidence
+    return (evidence + [f"{EVIDENCE_PREFIX}{new_evidence}"])[-EVIDENCE_PER_TRAIT:]
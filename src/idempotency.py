@@ -0,0 +1,159 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .state import SessionState
+
+# How long finished results are kept, in this process and in session state
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# How long a worker's claim on a key blocks other workers before it's presumed dead;
+# the claiming worker renews it every third of this while the reply is generated
+IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+# Completed keys kept per session in the shared state backend (oldest evicted first)
+IDEMPOTENCY_KEYS_PER_SESSION = 100
+
+
+class IdempotencyKeyMismatch(Exception):
+    """Raised when an idempotency key is reused for a different request"""
+
+
+class IdempotencyStore:
+    """Remembers results per idempotency key so client retries don't repeat the work.
+
+    A retry that arrives while the original is still running waits on the same
+    computation instead of starting another. Finished results are kept for
+    `ttl_seconds`, up to `max_entries` (oldest evicted first). Failures aren't
+    stored, so a retry after an error runs again.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Insertion order is creation order, which is also expiry order
+        self._results: "OrderedDict[Hashable, Tuple[Hashable, float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, Tuple[Hashable, asyncio.Future]] = {}
+
+    async def run(
+        self, key: Hashable, fingerprint: Hashable, compute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """Return (result, replayed), computing the result only if this key hasn't been seen"""
+        self._evict_expired()
+
+        stored = self._results.get(key)
+        if stored is not None:
+            self._check_fingerprint(stored[0], fingerprint)
+            return stored[2], True
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self._check_fingerprint(pending[0], fingerprint)
+            return await asyncio.shield(pending[1]), True
+
+        task = asyncio.ensure_future(compute())
+        self._in_flight[key] = (fingerprint, task)
+        task.add_done_callback(lambda done: self._finish(key, fingerprint, done))
+        # Shielded so a client that times out and disconnects doesn't cancel the work its retry will wait on
+        return await asyncio.shield(task), False
+
+    @staticmethod
+    def _check_fingerprint(stored: Hashable, fingerprint: Hashable):
+        if stored != fingerprint:
+            raise IdempotencyKeyMismatch("Idempotency-Key was already used for a different request")
+
+    def _finish(self, key: Hashable, fingerprint: Hashable, task: asyncio.Future):
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._results[key] = (fingerprint, time.monotonic() + self.ttl_seconds, task.result())
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        while self._results:
+            key, (_, expires_at, _) = next(iter(self._results.items()))
+            if expires_at > now:
+                return
+            del self._results[key]
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+
+def check_key(session: SessionState, key: str, fingerprint: List[str]) -> Tuple[str, Optional[str]]:
+    """Read-only lookup of an idempotency key in session state.
+
+    Returns ("done", reply) to replay a finished reply, ("pending", None) if a worker holds
+    an unexpired claim, or ("claimable", None) if the key is new or its claim has lapsed.
+    """
+    now = time.time()
+    entry = session.idempotency.get(key)
+    if entry is None or entry["expires_at"] <= now:
+        return "claimable", None
+    if entry["fingerprint"] != fingerprint:
+        raise IdempotencyKeyMismatch("Idempotency-Key was already used for a different request")
+    if entry["status"] == "done":
+        return "done", entry["response"]
+    if entry["lease_expires_at"] > now:
+        return "pending", None
+    return "claimable", None
+
+
+def claim_key(session: SessionState, key: str, fingerprint: List[str]) -> Tuple[str, Optional[str]]:
+    """Claim an idempotency key in shared session state.
+
+    Returns ("claimed", None) if the caller should compute the reply, or the "done"/"pending"
+    result of `check_key` if another worker got there first.
+    Runs inside `StateBackend.update`, so it only touches `session`.
+    """
+    status, reply = check_key(session, key, fingerprint)
+    if status != "claimable":
+        return status, reply
+
+    now = time.time()
+    for stored_key, entry in list(session.idempotency.items()):
+        if entry["expires_at"] <= now:
+            del session.idempotency[stored_key]
+    session.idempotency[key] = {
+        "fingerprint": fingerprint,
+        "status": "in_flight",
+        "response": None,
+        "lease_expires_at": now + IDEMPOTENCY_LEASE_SECONDS,
+        "expires_at": now + IDEMPOTENCY_TTL_SECONDS,
+    }
+    while len(session.idempotency) > IDEMPOTENCY_KEYS_PER_SESSION:
+        oldest = min(session.idempotency, key=lambda k: session.idempotency[k]["expires_at"])
+        del session.idempotency[oldest]
+    return "claimed", None
+
+
+def renew_key(session: SessionState, key: str):
+    """Extend an unfinished claim's lease while its reply is still being generated"""
+    entry = session.idempotency.get(key)
+    if entry is not None and entry["status"] == "in_flight":
+        entry["lease_expires_at"] = time.time() + IDEMPOTENCY_LEASE_SECONDS
+
+
+def complete_key(session: SessionState, key: str, response: str):
+    """Record the reply for a claimed key so retries on any worker replay it"""
+    entry = session.idempotency.get(key)
+    if entry is not None:
+        entry["status"] = "done"
+        entry["response"] = response
+
+
+def release_key(session: SessionState, key: str):
+    """Drop an unfinished claim after a failure so a retry can compute the reply"""
+    entry = session.idempotency.get(key)
+    if entry is not None and entry["status"] == "in_flight":
+        del session.idempotency[key]
+
+
+# Per-process store that attaches local retries to the in-flight computation;
+# results are also kept in session state (claim_key/complete_key) for other workers
+idempotency_store = IdempotencyStore(
+    max_entries=int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000")),
+    ttl_seconds=IDEMPOTENCY_TTL_SECONDS,
+)
@@ -1,9 +1,33 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+import logging
+import os
+from contextlib import asynccontextmanager
 
-from .router import router
+from dotenv import load_dotenv
 
-app = FastAPI(title="Mentor API", description="AI Mentors for Student Learning", version="1.0.0")
+# Load environment variables before any module reads its configuration
+load_dotenv()
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+
+from .router import router  # noqa: E402
+from .service import MentorService  # noqa: E402
+from .tracing import tracing_middleware  # noqa: E402
+
+# Service logs are single-line JSON (see tracing.log_event)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(message)s")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup finishes before the server accepts requests, so warming here happens before readiness
+    if os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true":
+        await run_in_threadpool(MentorService.warm_up)
+    yield
+
+
+app = FastAPI(title="Mentor API", description="AI Mentors for Student Learning", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware FIRST, before any routes
 app.add_middleware(
@@ -12,7 +36,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-Id"],
 )
+# Per-stage timings for every request (Server-Timing header + /debug/slow-requests)
+app.middleware("http")(tracing_middleware)
 # Include router
 app.include_router(router)
 
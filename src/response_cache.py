@@ -0,0 +1,104 @@
+import json
+import os
+import random
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+
+CacheKey = Tuple[str, Tuple[Tuple[str, str], ...], str]
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation so "Hi!" and "hi" share a key"""
+    return _WHITESPACE.sub(" ", text.lower()).strip().rstrip(".!?,;: ")
+
+
+class ResponseCache:
+    """Exact-match cache of character replies for short, common conversation openings.
+
+    Each key holds a pool of up to `pool_size` different replies. Until a pool is
+    full every request is a miss (and its reply joins the pool); once full, a
+    random reply from the pool is served so repeated openings don't feel canned.
+    Keys are evicted least-recently-used beyond `max_keys`.
+    """
+
+    def __init__(self, enabled: bool, max_keys: int, pool_size: int, max_history: int):
+        self.enabled = enabled
+        self.max_keys = max_keys
+        self.pool_size = pool_size
+        # Only conversations with at most this many prior messages are cached
+        self.max_history = max_history
+        self.hits = 0
+        self.misses = 0
+        self._pools: "OrderedDict[CacheKey, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, character: str, history: List[Dict[str, str]], message: str) -> Optional[CacheKey]:
+        """Build the cache key, or None if this turn isn't cacheable"""
+        if not self.enabled or len(history) > self.max_history:
+            return None
+        normalized_history = tuple((msg.get("role", ""), normalize_text(msg.get("content", ""))) for msg in history)
+        return character, normalized_history, normalize_text(message)
+
+    def get(self, key: Optional[CacheKey]) -> Optional[str]:
+        """Return a pooled reply if the pool for this key is full"""
+        if key is None:
+            return None
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None or len(pool) < self.pool_size:
+                self.misses += 1
+                return None
+            self._pools.move_to_end(key)
+            self.hits += 1
+            return random.choice(pool)
+
+    def add(self, key: Optional[CacheKey], reply: str):
+        """Add a freshly generated reply to the pool for this key"""
+        if key is None:
+            return
+        with self._lock:
+            pool = self._pools.setdefault(key, [])
+            self._pools.move_to_end(key)
+            if len(pool) < self.pool_size and reply not in pool:
+                pool.append(reply)
+            while len(self._pools) > self.max_keys:
+                self._pools.popitem(last=False)
+
+    def load_seed(self, path: str) -> int:
+        """Warm the cache from a JSON file of {"character", "history", "message", "replies"} entries"""
+        with open(path) as f:
+            entries = json.load(f)
+        loaded = 0
+        for entry in entries:
+            key = self.make_key(entry["character"], entry.get("history", []), entry["message"])
+            for reply in entry["replies"]:
+                self.add(key, reply)
+            loaded += key is not None
+        return loaded
+
+    def stats(self) -> Dict:
+        """Hit-rate metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "keys": len(self._pools),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache(
+    enabled=os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true",
+    max_keys=int(os.getenv("RESPONSE_CACHE_MAX_KEYS", "1000")),
+    pool_size=int(os.getenv("RESPONSE_CACHE_POOL_SIZE", "3")),
+    max_history=int(os.getenv("RESPONSE_CACHE_MAX_HISTORY", "0")),
+)
+
+if response_cache.enabled and os.getenv("RESPONSE_CACHE_SEED_FILE"):
+    response_cache.load_seed(os.environ["RESPONSE_CACHE_SEED_FILE"])
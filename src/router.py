@@ -1,10 +1,30 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import hmac
+import json
+import logging
+import math
+import os
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from .admission import AdmissionRejected, Priority, admission_controller
+from .idempotency import IDEMPOTENCY_LEASE_SECONDS, IdempotencyKeyMismatch, idempotency_store
+from .response_cache import response_cache
 from .service import MentorService
+from .state import DEFAULT_SESSION_ID
+from .tracing import log_event, slow_requests
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Identifies the conversation; any worker can serve any session
+SessionId = Header(default=DEFAULT_SESSION_ID, alias="X-Session-Id")
+
 
 class ChatRequest(BaseModel):
     character: str
@@ -16,26 +36,140 @@ class ChatResponse(BaseModel):
     character: str
 
 
+# Sessions handed to each threadpool call during import; every session is still
+# its own state-backend load and save, batching only saves event-loop/thread hops
+IMPORT_BATCH_SIZE = 100
+# How often a retry re-checks a reply that another worker is still generating
+IDEMPOTENCY_POLL_SECONDS = 0.25
+
+
+# Bearer token for the bulk session endpoints; they are disabled while this is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def require_admin_token(authorization: Optional[str] = Header(default=None)):
+    """Only serve admin endpoints to requests carrying `Authorization: Bearer <ADMIN_TOKEN>`"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+async def _renew_idempotency_lease(session_id: str, key: str):
+    """Renew a claim until cancelled, so a slow turn isn't taken over and run twice by another worker"""
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_LEASE_SECONDS / 3)
+        try:
+            await run_in_threadpool(MentorService.renew_idempotency_key, session_id, key)
+        except Exception as e:
+            log_event(logger, "idempotency_renew_failed", level=logging.WARNING, session_id=session_id, error=str(e))
+
+
+def _too_many_requests(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[Dict]:
+    """Parse an NDJSON request body line by line as it arrives"""
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _parse_ndjson_line(line, line_number)
+    # The last line may not end with a newline
+    if buffer.strip():
+        yield _parse_ndjson_line(buffer, line_number + 1)
+
+
+def _parse_ndjson_line(line: bytes, line_number: int) -> Dict:
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+
+
 @router.get("/")
 async def root():
     return {"message": "Mentor API is running!"}
 
 
 @router.get("/profile", tags=["Profile"])
-async def get_profile():
+async def get_profile(session_id: str = SessionId):
     """Get current user profile"""
-    return MentorService.get_profile()
+    return await run_in_threadpool(MentorService.get_profile, session_id)
+
+
+@router.post("/profile/refresh", tags=["Profile"])
+async def refresh_profile(session_id: str = SessionId):
+    """Re-analyze the whole conversation and return the updated profile"""
+    try:
+        async with admission_controller.admit(session_id, Priority.BACKGROUND):
+            return await run_in_threadpool(MentorService.force_profile_update, session_id)
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
 
 
 @router.post("/chat", response_model=ChatResponse, tags=["Chat"])
-async def chat(request: ChatRequest):
-    """Chat with a character"""
+async def chat(
+    request: ChatRequest,
+    response: Response,
+    session_id: str = SessionId,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    """Chat with a character. Retries carrying the same Idempotency-Key replay the first reply."""
+
+    async def generate_reply() -> str:
+        async with admission_controller.admit(session_id, Priority.INTERACTIVE):
+            return await run_in_threadpool(
+                MentorService.chat_with_character, request.character, request.message, session_id, idempotency_key
+            )
+
+    async def reply_once() -> Tuple[str, bool]:
+        # The claim lives in session state, so a retry routed to another worker sees it too
+        fingerprint = [request.character, request.message]
+        while True:
+            status, stored_reply = await run_in_threadpool(
+                MentorService.claim_idempotency_key, session_id, idempotency_key, fingerprint
+            )
+            if status == "done":
+                return stored_reply, True
+            if status == "claimed":
+                heartbeat = asyncio.ensure_future(_renew_idempotency_lease(session_id, idempotency_key))
+                try:
+                    ai_message = await generate_reply()
+                except BaseException:
+                    heartbeat.cancel()
+                    await asyncio.shield(
+                        run_in_threadpool(MentorService.release_idempotency_key, session_id, idempotency_key)
+                    )
+                    raise
+                heartbeat.cancel()
+                return ai_message, False
+            # Another worker is generating this reply; wait for it (or for its lease to lapse)
+            await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
     try:
-        ai_message = MentorService.chat_with_character(request.character, request.message)
+        if idempotency_key:
+            (ai_message, replayed_elsewhere), replayed = await idempotency_store.run(
+                (session_id, idempotency_key), (request.character, request.message), reply_once
+            )
+            if replayed or replayed_elsewhere:
+                response.headers["Idempotent-Replayed"] = "true"
+        else:
+            ai_message = await generate_reply()
         return ChatResponse(
             message=ai_message,
             character=request.character,
         )
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
+    except IdempotencyKeyMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -49,28 +183,76 @@ async def get_characters():
 
 
 @router.get("/conversation", tags=["Conversation"])
-async def get_conversation():
+async def get_conversation(session_id: str = SessionId):
     """Get current conversation history"""
-    return {"conversation": MentorService.get_conversation()}
+    return {"conversation": await run_in_threadpool(MentorService.get_conversation, session_id)}
+
+
+@router.get("/sessions/export", tags=["Sessions"], dependencies=[Depends(require_admin_token)])
+async def export_sessions(since: Optional[float] = None, until: Optional[float] = None):
+    """Stream every session (transcript and profile) as NDJSON, optionally filtered by last update time"""
+    return StreamingResponse(MentorService.export_sessions(since, until), media_type="application/x-ndjson")
+
+
+@router.post("/sessions/import", tags=["Sessions"], dependencies=[Depends(require_admin_token)])
+async def import_sessions(request: Request):
+    """Restore sessions from an NDJSON body in the export format"""
+    imported = 0
+    batch = []
+    try:
+        async for record in _iter_ndjson(request):
+            batch.append(record)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                imported += await run_in_threadpool(MentorService.import_sessions, batch)
+                batch = []
+        imported += await run_in_threadpool(MentorService.import_sessions, batch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e} ({imported} sessions imported before the error)")
+    return {"imported": imported}
 
 
 @router.delete("/reset", tags=["Demo"])
-async def reset_demo():
+async def reset_demo(session_id: str = SessionId):
     """Reset conversation and profile for demo"""
-    MentorService.reset_demo()
+    await run_in_threadpool(MentorService.reset_demo, session_id)
     return {"message": "Demo reset"}
 
 
 @router.get("/recommendations", tags=["Recommendations"])
-async def get_character_recommendations():
+async def get_character_recommendations(session_id: str = SessionId):
     """Get 5 character recommendations based on user personality profile"""
     try:
-        recommended_characters = MentorService.get_character_recommendations()
+        # Cached recommendations cost no LLM call, so they don't need an admission slot
+        recommended_characters = await run_in_threadpool(MentorService.get_cached_recommendations, session_id)
+        if recommended_characters is not None:
+            return {"recommended_characters": recommended_characters}
+        async with admission_controller.admit(session_id, Priority.BACKGROUND):
+            recommended_characters = await run_in_threadpool(MentorService.get_character_recommendations, session_id)
         return {"recommended_characters": recommended_characters}
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating recommendations: {str(e)}")
 
 
+@router.get("/metrics/admission", tags=["Metrics"])
+async def admission_metrics():
+    """Queue depth, in-flight count and wait times for LLM-bound endpoints"""
+    return admission_controller.snapshot()
+
+
+@router.get("/metrics/response-cache", tags=["Metrics"])
+async def response_cache_metrics():
+    """Hit rate of the opening-turn response cache"""
+    return response_cache.stats()
+
+
+@router.get("/debug/slow-requests", tags=["Debug"])
+async def get_slow_requests():
+    """Slowest requests served by this worker, with their per-stage breakdown"""
+    return {"slow_requests": slow_requests.slowest()}
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
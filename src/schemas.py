@@ -208,3 +208,18 @@ CHARACTER_RECOMMENDATIONS_SCHEMA = {
     "required": ["recommended_characters"],
     "additionalProperties": False,
 }
+
+# Prebuilt response_format payloads, shared by every structured-output request
+PROFILE_ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "profile_analysis", "strict": True, "schema": PROFILE_ANALYSIS_SCHEMA},
+}
+
+CHARACTER_RECOMMENDATIONS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "character_recommendations",
+        "strict": True,
+        "schema": CHARACTER_RECOMMENDATIONS_SCHEMA,
+    },
+}
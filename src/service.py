@@ -1,22 +1,53 @@
+import asyncio
 import json
+import logging
 import os
-from typing import Dict, List, Optional
-
-from dotenv import load_dotenv
-from openai import OpenAI
-
-from .prompts import CHARACTER_PROMPTS
-
-from .schemas import PERSONALITY_TRAITS, PROFILE_ANALYSIS_SCHEMA, CHARACTER_RECOMMENDATIONS_SCHEMA
-
-# Load environment variables
-load_dotenv()
-
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Simple global storage for demo
-conversation_history: List[Dict[str, str]] = []
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import anyio.from_thread
+import anyio.to_thread
+
+from .admission import AdmissionRejected, Priority, admission_controller
+from .compaction import BIO_CONDENSE_TOKENS, add_evidence, estimate_tokens, merge_bio, truncate_to_tokens
+from .idempotency import check_key, claim_key, complete_key, release_key, renew_key
+from .prompts import (
+    CHARACTER_PROMPTS,
+    CHARACTER_SYSTEM_MESSAGES,
+    CHARACTERS,
+    CHARACTERS_BY_ID,
+    RECOMMENDABLE_CHARACTER_LIST,
+)
+from .response_cache import response_cache
+
+from .schemas import PERSONALITY_TRAITS, PROFILE_ANALYSIS_RESPONSE_FORMAT, CHARACTER_RECOMMENDATIONS_RESPONSE_FORMAT
+from .state import DEFAULT_SESSION_ID, SessionState, create_state_backend
+from .tracing import log_event, span
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+# OpenAI client, created on first use (or by MentorService.warm_up) so importing the service stays cheap
+client: Optional["OpenAI"] = None
+_client_lock = threading.Lock()
+
+# Session storage shared by all workers (see STATE_BACKEND)
+state_backend = create_state_backend()
+
+# System prompt for the bio condense pass (offline replay recognizes it to stand in deterministically)
+BIO_CONDENSE_PROMPT = (
+    "Condense this user bio into one short third-person paragraph. "
+    "Keep every distinct fact, drop repetition, do not invent anything. "
+    f"Stay under {BIO_CONDENSE_TOKENS // 2} words."
+)
+
+# Bio condensing runs off the request path; sessions already queued are tracked to avoid piling up
+_condensing_sessions: set = set()
+_condensing_lock = threading.Lock()
+# Strong references to running condense tasks so they aren't garbage collected mid-flight
+_background_tasks: set = set()
 
 
 class PersonalityProfile:
@@ -52,12 +83,20 @@ class PersonalityProfile:
 
     def _update_from_conversation(self, conversation: List[Dict[str, str]]):
         """Internal method to update profile from conversation data"""
+        analysis = self._analyze_conversation(conversation)
+        if analysis:
+            self.apply_analysis(analysis)
+            _log_profile_update(analysis, _count_user_messages(conversation))
+
+    def _analyze_conversation(self, conversation: List[Dict[str, str]]) -> Optional[Dict]:
+        """Run the profile analyzer over a conversation, returning None if there is nothing to apply"""
         try:
             # Prepare conversation context for analysis
-            conversation_text = self._format_conversation_for_analysis(conversation)
+            with span("format_conversation"):
+                conversation_text = self._format_conversation_for_analysis(conversation)
 
             if not conversation_text.strip():
-                return
+                return None
 
             # Create system prompt for comprehensive analysis
             system_prompt = f"""
@@ -86,66 +125,60 @@ class PersonalityProfile:
             Only include fields if there is clear evidence. Set has_updates to false if no meaningful information detected.
             """
 
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Analyze this complete conversation:\n\n{conversation_text}"},
-                ],
-                temperature=0.3,
-                max_tokens=800,
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {"name": "profile_analysis", "strict": True, "schema": PROFILE_ANALYSIS_SCHEMA},
-                },
-            )
+            with span("profile_llm"):
+                response = get_client().chat.completions.create(
+                    model="gpt-4o",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": f"Analyze this complete conversation:\n\n{conversation_text}"},
+                    ],
+                    temperature=0.3,
+                    max_tokens=800,
+                    response_format=PROFILE_ANALYSIS_RESPONSE_FORMAT,
+                )
 
             # Parse response - guaranteed to be valid JSON due to structured output
-            analysis = json.loads(response.choices[0].message.content)
+            with span("profile_parse"):
+                analysis = json.loads(response.choices[0].message.content)
 
             if not analysis.get("has_updates", False):
-                return
+                return None
 
-            # Update basic info (name, bio only)
-            basic_profile = analysis.get("basic_profile", {})
-            if basic_profile.get("name") and not self.name:  # Only update if not already set
-                self.name = basic_profile["name"]
-            if basic_profile.get("bio"):
-                new_bio = basic_profile["bio"]
-                # Only update bio if it's new information (not already contained in current bio)
-                if not self.bio:
-                    self.bio = new_bio
-                elif new_bio not in self.bio:  # Check if new info is already present
-                    self.bio = f"{self.bio}. {new_bio}"
-
-            # Update personality traits with conversation-based analysis
-            personality_updates = analysis.get("personality_updates", {})
-            for trait_name, update_info in personality_updates.items():
-                if trait_name in self.personality_scores:
-                    new_score = float(update_info.get("score", 5))
-                    evidence = update_info.get("evidence", "")
-
-                    # For conversation-based updates, give more weight to comprehensive analysis
-                    # Use 50% weight for new analysis since it's based on full context
-                    current_score = self.personality_scores[trait_name]
-                    self.personality_scores[trait_name] = (current_score * 0.5) + (new_score * 0.5)
-
-                    # Update evidence with conversation-based insights
-                    if evidence:
-                        self.trait_evidence[trait_name].append(f"From conversation: {evidence}")
-                        # Keep only last 3 pieces of evidence for conversation-based updates
-                        if len(self.trait_evidence[trait_name]) > 3:
-                            self.trait_evidence[trait_name] = self.trait_evidence[trait_name][-3:]
-
-            print(
-                f"Profile updated from conversation history. Messages analyzed: {len([m for m in conversation if m.get('role') == 'user'])}, "
-                f"Basic profile updates: {bool(basic_profile)}, Personality updates: {list(personality_updates.keys())}"
-            )
+            return analysis
 
         except json.JSONDecodeError as e:
-            print(f"JSON parsing error (should not happen with structured output): {e}")
+            # Should not happen with structured output
+            log_event(logger, "profile_analysis_invalid_json", level=logging.ERROR, error=str(e))
         except Exception as e:
-            print(f"Profile update error: {e}")
+            log_event(logger, "profile_analysis_failed", level=logging.ERROR, error=str(e))
+        return None
+
+    def apply_analysis(self, analysis: Dict):
+        """Merge an analyzer result into the profile (no LLM calls, safe to re-run on a fresh copy)"""
+        # Update basic info (name, bio only)
+        basic_profile = analysis.get("basic_profile", {})
+        if basic_profile.get("name") and not self.name:  # Only update if not already set
+            self.name = basic_profile["name"]
+        if basic_profile.get("bio"):
+            # Only add new information, keeping the bio under its token cap
+            self.bio = merge_bio(self.bio, basic_profile["bio"])
+
+        # Update personality traits with conversation-based analysis
+        personality_updates = analysis.get("personality_updates", {})
+        for trait_name, update_info in personality_updates.items():
+            # Strict structured output returns null for traits without evidence
+            if trait_name in self.personality_scores and update_info:
+                new_score = float(update_info.get("score", 5))
+                evidence = update_info.get("evidence", "")
+
+                # For conversation-based updates, give more weight to comprehensive analysis
+                # Use 50% weight for new analysis since it's based on full context
+                current_score = self.personality_scores[trait_name]
+                self.personality_scores[trait_name] = (current_score * 0.5) + (new_score * 0.5)
+
+                # Update evidence with conversation-based insights, skipping repeats
+                if evidence:
+                    self.trait_evidence[trait_name] = add_evidence(self.trait_evidence[trait_name], evidence)
 
     def _format_conversation_for_analysis(self, conversation: List[Dict[str, str]]) -> str:
         """Format conversation for AI analysis"""
@@ -194,20 +227,168 @@ class PersonalityProfile:
             "messages_analyzed": self.last_update_message_count,
         }
 
+    def to_state(self) -> Dict:
+        """Serialize the full profile for the state backend"""
+        return {
+            "name": self.name,
+            "bio": self.bio,
+            "personality_scores": self.personality_scores,
+            "trait_evidence": self.trait_evidence,
+            "last_update_message_count": self.last_update_message_count,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "PersonalityProfile":
+        """Rebuild a profile from the state backend (an empty dict gives a fresh profile)"""
+        profile = cls()
+        profile.name = state.get("name")
+        profile.bio = state.get("bio")
+        profile.personality_scores.update(state.get("personality_scores", {}))
+        profile.trait_evidence.update(state.get("trait_evidence", {}))
+        profile.last_update_message_count = state.get("last_update_message_count", 0)
+        return profile
+
     def reset(self):
         """Reset profile to initial state"""
         self.__init__()
 
 
-# Global profile instance
-user_profile = PersonalityProfile()
+def get_client() -> "OpenAI":
+    """Return the shared OpenAI client, importing and constructing it on first use"""
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from openai import OpenAI
+
+                client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return client
+
+
+def _count_user_messages(conversation: List[Dict[str, str]]) -> int:
+    return len([msg for msg in conversation if msg.get("role") == "user"])
+
+
+def _log_profile_update(analysis: Dict, messages_analyzed: int) -> None:
+    personality_updates = analysis.get("personality_updates", {})
+    log_event(
+        logger,
+        "profile_updated",
+        messages_analyzed=messages_analyzed,
+        basic_profile_updated=bool(analysis.get("basic_profile")),
+        personality_updates=[trait for trait, update in personality_updates.items() if update],
+    )
+
+
+def _condense_bio(session_id: str, bio: str) -> None:
+    """Rewrite a long bio into a shorter summary and store it if the bio hasn't changed meanwhile"""
+    try:
+        response = get_client().chat.completions.create(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": BIO_CONDENSE_PROMPT},
+                {"role": "user", "content": bio},
+            ],
+            temperature=0.2,
+            max_tokens=BIO_CONDENSE_TOKENS,
+        )
+        condensed = truncate_to_tokens(response.choices[0].message.content.strip(), BIO_CONDENSE_TOKENS)
+
+        def store_condensed_bio(session: SessionState):
+            if session.profile.get("bio") == bio:
+                session.profile["bio"] = condensed
+
+        state_backend.update(session_id, store_condensed_bio)
+    except Exception as e:
+        log_event(logger, "bio_condense_failed", level=logging.ERROR, session_id=session_id, error=str(e))
+    finally:
+        with _condensing_lock:
+            _condensing_sessions.discard(session_id)
+
+
+def _validate_session_record(record: Dict) -> None:
+    """Raise ValueError unless record is a session in the /sessions/export format"""
+    if not isinstance(record, dict):
+        raise ValueError("Session record must be a JSON object")
+    session_id = record.get("session_id")
+    if not isinstance(session_id, str) or not session_id:
+        raise ValueError("Session record is missing session_id")
+
+    updated_at = record.get("updated_at")
+    if updated_at is not None and (isinstance(updated_at, bool) or not isinstance(updated_at, (int, float))):
+        raise ValueError(f"Session {session_id}: updated_at must be a number")
+
+    conversation = record.get("conversation", [])
+    if not isinstance(conversation, list):
+        raise ValueError(f"Session {session_id}: conversation must be a list of messages")
+    for message in conversation:
+        if (
+            not isinstance(message, dict)
+            or message.get("role") not in ("user", "assistant")
+            or not isinstance(message.get("content"), str)
+        ):
+            raise ValueError(f"Session {session_id}: each message needs a user/assistant role and string content")
+
+    profile = record.get("profile", {})
+    if not isinstance(profile, dict):
+        raise ValueError(f"Session {session_id}: profile must be an object")
+    if any(not isinstance(profile.get(key), (str, type(None))) for key in ("name", "bio")):
+        raise ValueError(f"Session {session_id}: profile name and bio must be strings")
+    scores = profile.get("personality_scores", {})
+    if not isinstance(scores, dict) or any(
+        isinstance(score, bool) or not isinstance(score, (int, float)) or not 1 <= score <= 10
+        for score in scores.values()
+    ):
+        raise ValueError(f"Session {session_id}: personality_scores must map traits to numbers from 1 to 10")
+    evidence = profile.get("trait_evidence", {})
+    if not isinstance(evidence, dict) or any(
+        not isinstance(entries, list) or not all(isinstance(entry, str) for entry in entries)
+        for entries in evidence.values()
+    ):
+        raise ValueError(f"Session {session_id}: trait_evidence must map traits to lists of strings")
+    # Unknown traits would otherwise surface in /profile and in every analyzer prompt
+    unknown_traits = (set(scores) | set(evidence)) - set(PERSONALITY_TRAITS)
+    if unknown_traits:
+        raise ValueError(f"Session {session_id}: unknown personality traits: {', '.join(sorted(unknown_traits))}")
+    message_count = profile.get("last_update_message_count", 0)
+    if isinstance(message_count, bool) or not isinstance(message_count, int):
+        raise ValueError(f"Session {session_id}: last_update_message_count must be an integer")
+
+
+async def _condense_bio_in_background(session_id: str, bio: str) -> None:
+    """Condense at background priority so it counts against the admission cap and yields to chat"""
+    try:
+        async with admission_controller.admit(session_id, Priority.BACKGROUND):
+            await anyio.to_thread.run_sync(_condense_bio, session_id, bio)
+    except AdmissionRejected:
+        # Too busy; the next profile update that leaves the bio long will try again
+        with _condensing_lock:
+            _condensing_sessions.discard(session_id)
+
+
+def _spawn_bio_condense(session_id: str, bio: str) -> None:
+    task = asyncio.get_running_loop().create_task(_condense_bio_in_background(session_id, bio))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 
 class MentorService:
     @staticmethod
-    def get_profile() -> Dict:
+    def warm_up() -> None:
+        """Create the OpenAI client and open a pooled connection so the first chat skips the TLS handshake"""
+        try:
+            with span("warm_up"):
+                # with_options shares the underlying HTTP connection pool
+                get_client().with_options(timeout=5, max_retries=0).models.list()
+            log_event(logger, "warm_up_completed")
+        except Exception as e:
+            log_event(logger, "warm_up_failed", level=logging.WARNING, error=str(e))
+
+    @staticmethod
+    def get_profile(session_id: str = DEFAULT_SESSION_ID) -> Dict:
         """Get current user profile"""
-        return user_profile.to_dict()
+        state = state_backend.load(session_id)
+        return PersonalityProfile.from_state(state.profile).to_dict()
 
     @staticmethod
     def get_personality_traits() -> Dict:
@@ -215,31 +396,40 @@ class MentorService:
         return PERSONALITY_TRAITS
 
     @staticmethod
-    def get_character_recommendations() -> List[Dict]:
+    def _cached_recommendations(state: SessionState) -> Optional[List[Dict]]:
+        if state.recommendations is not None and state.recommendations_message_count == len(state.conversation):
+            return state.recommendations
+        return None
+
+    @staticmethod
+    def get_cached_recommendations(session_id: str = DEFAULT_SESSION_ID) -> Optional[List[Dict]]:
+        """Return stored recommendations if the conversation hasn't changed since they were made"""
+        return MentorService._cached_recommendations(state_backend.load(session_id))
+
+    @staticmethod
+    def get_character_recommendations(session_id: str = DEFAULT_SESSION_ID) -> List[Dict]:
         """Get 5 character recommendations based on conversation history only"""
-        try:
-            # Get available characters for the AI to choose from
-            available_characters = MentorService.get_characters()
-            character_list = "\n".join(
-                [
-                    f"- {char['id']}: {char['name']} - {char['description']}"
-                    for char in available_characters
-                    if char["id"] != "mentor"
-                ]
-            )
+        state = state_backend.load(session_id)
+        conversation_history = state.conversation
+
+        # Reuse the last recommendations until the conversation changes
+        cached = MentorService._cached_recommendations(state)
+        if cached is not None:
+            return cached
 
+        try:
             # Format conversation history for context
             conversation_context = ""
             if conversation_history:
-                print(conversation_history)
                 recent_messages = conversation_history[-20:]  # Last 20 messages for context
-                conversation_context = "\n".join(
-                    [
-                        f"{msg.get('role', 'unknown').title()}: {msg.get('content', '')}"
-                        for msg in recent_messages
-                        if msg.get("content")
-                    ]
-                )
+                with span("format_conversation"):
+                    conversation_context = "\n".join(
+                        [
+                            f"{msg.get('role', 'unknown').title()}: {msg.get('content', '')}"
+                            for msg in recent_messages
+                            if msg.get("content")
+                        ]
+                    )
 
             system_prompt = f"""
             Based ONLY on the chat conversation history below, recommend exactly 5 mentors who would be most beneficial for this user's development.
@@ -248,7 +438,7 @@ class MentorService:
             {conversation_context if conversation_context else "No conversation history available"}
             
             Available Characters:
-            {character_list}
+            {RECOMMENDABLE_CHARACTER_LIST}
             
             Instructions:
             1. Analyze what the user talks about, their interests, challenges, and goals from the conversation
@@ -264,34 +454,29 @@ class MentorService:
             Ignore any personality scores or profiles - base recommendations purely on the conversation content and what the user has actually said.
             """
 
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {
-                        "role": "user",
-                        "content": "Based only on what I've said in our conversation, recommend 5 mentors who could help me most. Order them from best match to least match.",
-                    },
-                ],
-                temperature=0.3,
-                max_tokens=800,
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "character_recommendations",
-                        "strict": True,
-                        "schema": CHARACTER_RECOMMENDATIONS_SCHEMA,
-                    },
-                },
-            )
+            with span("recommendations_llm"):
+                response = get_client().chat.completions.create(
+                    model="gpt-4o",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {
+                            "role": "user",
+                            "content": "Based only on what I've said in our conversation, recommend 5 mentors who could help me most. Order them from best match to least match.",
+                        },
+                    ],
+                    temperature=0.3,
+                    max_tokens=800,
+                    response_format=CHARACTER_RECOMMENDATIONS_RESPONSE_FORMAT,
+                )
 
             # Parse and enrich the AI response
-            ai_response = json.loads(response.choices[0].message.content)
+            with span("recommendations_parse"):
+                ai_response = json.loads(response.choices[0].message.content)
 
             # Add character details to recommendations
             enriched_recommendations = []
             for rec in ai_response["recommended_characters"]:
-                char_info = next((char for char in available_characters if char["id"] == rec["character_id"]), None)
+                char_info = CHARACTERS_BY_ID.get(rec["character_id"])
 
                 if char_info:
                     enriched_recommendations.append(
@@ -303,92 +488,201 @@ class MentorService:
                         }
                     )
 
+            def store_recommendations(session: SessionState):
+                session.recommendations = enriched_recommendations
+                session.recommendations_message_count = len(conversation_history)
+
+            state_backend.update(session_id, store_recommendations)
             return enriched_recommendations
 
         except Exception as e:
-            print(f"Error generating character recommendations: {e}")
+            log_event(logger, "recommendations_failed", level=logging.ERROR, error=str(e))
             return []
 
     @staticmethod
     def get_characters() -> List[Dict[str, str]]:
         """Get available characters"""
-        return [
-            {"id": "mentor", "name": "Main Mentor", "description": "Your guide to finding the right mentor"},
-            {"id": "florence_nightingale", "name": "Florence Nightingale", "description": "Healthcare and compassion"},
-            {
-                "id": "maria_montessori",
-                "name": "Maria Montessori",
-                "description": "Innovative education and child development",
-            },
-            {
-                "id": "george_carver",
-                "name": "George Washington Carver",
-                "description": "Agriculture and sustainability",
-            },
-            {"id": "brunel", "name": "Isambard Kingdom Brunel", "description": "Engineering and infrastructure"},
-            {"id": "ada_lovelace", "name": "Ada Lovelace", "description": "Computing and mathematical logic"},
-            {"id": "walt_disney", "name": "Walt Disney", "description": "Creativity and entertainment"},
-            {"id": "warren_buffet", "name": "Warren Buffett", "description": "Finance and investing"},
-            {"id": "rbg", "name": "Ruth Bader Ginsburg", "description": "Law and justice"},
-            {"id": "marie_curie", "name": "Marie Curie", "description": "Chemistry and scientific research"},
-            {"id": "greta_thunberg", "name": "Greta Thunberg", "description": "Climate activism and sustainability"},
-            {"id": "neil_armstrong", "name": "Neil Armstrong", "description": "Space exploration and aerospace"},
-            {"id": "coco_chanel", "name": "Coco Chanel", "description": "Fashion and design"},
-            {"id": "elon_musk", "name": "Elon Musk", "description": "Technology, transport, and innovation"},
-            {"id": "anthony_bourdain", "name": "Anthony Bourdain", "description": "Food, travel, and global culture"},
-        ]
+        return CHARACTERS
 
     @staticmethod
-    def get_conversation() -> List[Dict[str, str]]:
+    def get_conversation(session_id: str = DEFAULT_SESSION_ID) -> List[Dict[str, str]]:
         """Get current conversation history"""
-        return conversation_history
+        return state_backend.load(session_id).conversation
+
+    @staticmethod
+    def export_sessions(since: Optional[float] = None, until: Optional[float] = None) -> Iterator[str]:
+        """Yield one NDJSON line per session updated in [since, until)"""
+        for state in state_backend.iter_sessions(since, until):
+            record = {
+                "session_id": state.session_id,
+                "updated_at": state.updated_at,
+                "conversation": state.conversation,
+                "profile": state.profile,
+            }
+            yield json.dumps(record) + "\n"
+
+    @staticmethod
+    def import_sessions(records: Iterable[Dict]) -> int:
+        """Restore sessions from exported records, replacing any existing session with the same id.
+
+        Each record is validated first (ValueError on a malformed one), and keeps its exported
+        `updated_at` so a later `export_sessions(since=...)` still sees the original timeline.
+        """
+        imported = 0
+        for record in records:
+            _validate_session_record(record)
+
+            def restore(session: SessionState):
+                session.conversation = record.get("conversation", [])
+                session.profile = PersonalityProfile.from_state(record.get("profile", {})).to_state()
+                session.recommendations = None
+                session.recommendations_message_count = -1
+                session.idempotency = {}
+
+            state_backend.update(record["session_id"], restore, updated_at=record.get("updated_at"))
+            imported += 1
+        return imported
 
     @staticmethod
-    def reset_demo() -> None:
+    def reset_demo(session_id: str = DEFAULT_SESSION_ID) -> None:
         """Reset conversation and profile for demo"""
-        global conversation_history, user_profile
-        conversation_history.clear()
-        user_profile.reset()
+        state_backend.delete(session_id)
 
     @staticmethod
-    def chat_with_character(character: str, message: str) -> str:
-        """Chat with a character and return response"""
+    def _refresh_profile(state: SessionState, force: bool = False) -> SessionState:
+        """Analyze new user messages and merge the result into the stored profile.
+
+        The analyzer call runs outside the versioned update so a conflict only
+        re-applies the result instead of paying for another completion.
+        """
+        profile = PersonalityProfile.from_state(state.profile)
+        user_message_count = _count_user_messages(state.conversation)
+
+        # Only update if there are new messages or significant conversation growth
+        if not force and user_message_count <= profile.last_update_message_count:
+            return state
+
+        analysis = profile._analyze_conversation(state.conversation)
+
+        def apply_profile_update(session: SessionState):
+            session_profile = PersonalityProfile.from_state(session.profile)
+            if not force and user_message_count <= session_profile.last_update_message_count:
+                return  # Another worker already analyzed these messages
+            if analysis:
+                session_profile.apply_analysis(analysis)
+            session_profile.last_update_message_count = user_message_count
+            session.profile = session_profile.to_state()
+
+        state = state_backend.update(state.session_id, apply_profile_update)
+        if analysis:
+            _log_profile_update(analysis, user_message_count)
+        MentorService._schedule_bio_condense(state)
+        return state
+
+    @staticmethod
+    def _schedule_bio_condense(state: SessionState) -> None:
+        """Queue a background condense once the bio grows past BIO_CONDENSE_TOKENS"""
+        bio = state.profile.get("bio")
+        if estimate_tokens(bio) <= BIO_CONDENSE_TOKENS:
+            return
+        with _condensing_lock:
+            if state.session_id in _condensing_sessions:
+                return
+            _condensing_sessions.add(state.session_id)
+        try:
+            # Requests run the service in an AnyIO worker thread; hand the condense to the event loop
+            anyio.from_thread.run_sync(_spawn_bio_condense, state.session_id, bio)
+        except RuntimeError:
+            # No event loop (scripts, offline replay): there is no admission to go through, condense inline
+            _condense_bio(state.session_id, bio)
+
+    @staticmethod
+    def claim_idempotency_key(session_id: str, key: str, fingerprint: List[str]) -> Tuple[str, Optional[str]]:
+        """Claim an Idempotency-Key in shared session state (see idempotency.claim_key)"""
+        # Replays and waiting retries only read; the session is written only to take a claim
+        status, reply = check_key(state_backend.load(session_id), key, fingerprint)
+        if status != "claimable":
+            return status, reply
+
+        claimed = None
+
+        def claim(session: SessionState):
+            nonlocal claimed
+            # update() may retry the mutation, so only the last attempt's result counts
+            claimed = claim_key(session, key, fingerprint)
+
+        state_backend.update(session_id, claim)
+        return claimed
+
+    @staticmethod
+    def renew_idempotency_key(session_id: str, key: str) -> None:
+        """Keep a claim alive while its reply is still being generated"""
+        state_backend.update(session_id, lambda session: renew_key(session, key))
+
+    @staticmethod
+    def release_idempotency_key(session_id: str, key: str) -> None:
+        """Give up a claim whose reply failed, so a retry on any worker can run it"""
+        state_backend.update(session_id, lambda session: release_key(session, key))
+
+    @staticmethod
+    def chat_with_character(
+        character: str, message: str, session_id: str = DEFAULT_SESSION_ID, idempotency_key: Optional[str] = None
+    ) -> str:
+        """Chat with a character and return response.
+
+        With an `idempotency_key` previously claimed via `claim_idempotency_key`, the reply is
+        recorded against it in the same update that appends it to the conversation.
+        """
         if character not in CHARACTER_PROMPTS:
             raise ValueError(f"Unknown character: {character}")
 
         # Add user message to history first
-        conversation_history.append({"role": "user", "content": message})
+        state = state_backend.update(
+            session_id, lambda session: session.conversation.append({"role": "user", "content": message})
+        )
 
         # UPDATE PROFILE BASED ON ENTIRE CONVERSATION HISTORY - This is the key change
-        user_profile.update_from_conversation_history(conversation_history)
+        state = MentorService._refresh_profile(state)
+
+        # Common openings can be answered from the response cache
+        cache_key = response_cache.make_key(character, state.conversation[:-1], message)
+        ai_message = response_cache.get(cache_key)
+
+        if ai_message is None:
+            # Prepare messages for OpenAI
+            messages = [CHARACTER_SYSTEM_MESSAGES[character]]
+            messages.extend(state.conversation[-10:])
+
+            with span("mentor_llm"):
+                response = get_client().chat.completions.create(
+                    model="gpt-4o",
+                    messages=messages,
+                    temperature=0.8,
+                    max_tokens=200,
+                )
 
-        # Prepare messages for OpenAI
-        messages = [{"role": "system", "content": CHARACTER_PROMPTS[character]}]
-        messages.extend(conversation_history[-10:])
+            ai_message = response.choices[0].message.content
+            response_cache.add(cache_key, ai_message)
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.8,
-            max_tokens=200,
-        )
+        def append_reply(session: SessionState):
+            session.conversation.append({"role": "assistant", "content": ai_message})
+            if idempotency_key:
+                complete_key(session, idempotency_key, ai_message)
 
-        ai_message = response.choices[0].message.content
-        conversation_history.append({"role": "assistant", "content": ai_message})
+        state_backend.update(session_id, append_reply)
 
         return ai_message
 
     @staticmethod
-    def force_profile_update() -> Dict:
+    def force_profile_update(session_id: str = DEFAULT_SESSION_ID) -> Dict:
         """Force a complete profile update based on current conversation history"""
-        user_profile.last_update_message_count = 0  # Reset to force update
-        user_profile.update_from_conversation_history(conversation_history)
-        return user_profile.to_dict()
+        state = MentorService._refresh_profile(state_backend.load(session_id), force=True)
+        return PersonalityProfile.from_state(state.profile).to_dict()
 
     @staticmethod
-    def get_personality_summary() -> str:
+    def get_personality_summary(session_id: str = DEFAULT_SESSION_ID) -> str:
         """Get a human-readable personality summary"""
-        profile_dict = user_profile.to_dict()
+        profile_dict = MentorService.get_profile(session_id)
 
         summary_parts = []
 
@@ -410,9 +704,9 @@ class MentorService:
         return "\n".join(summary_parts)
 
     @staticmethod
-    def get_career_recommendations() -> Dict:
+    def get_career_recommendations(session_id: str = DEFAULT_SESSION_ID) -> Dict:
         """Get career recommendations based on current profile"""
-        profile_dict = user_profile.to_dict()
+        profile_dict = MentorService.get_profile(session_id)
 
         return {
             "name": profile_dict["name"],
@@ -0,0 +1,257 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .tracing import span
+
+DEFAULT_SESSION_ID = "default"
+
+
+class VersionConflictError(Exception):
+    """Raised when a session was modified by another worker since it was loaded"""
+
+
+@dataclass
+class SessionState:
+    """Everything a worker needs to serve a turn for one session"""
+
+    session_id: str
+    conversation: List[Dict[str, str]] = field(default_factory=list)
+    profile: Dict = field(default_factory=dict)
+    recommendations: Optional[List[Dict]] = None
+    recommendations_message_count: int = -1
+    # Idempotency-Key -> claim/result record, shared so retries can land on any worker
+    idempotency: Dict[str, Dict] = field(default_factory=dict)
+    version: int = 0
+    updated_at: float = 0.0
+
+    def to_payload(self) -> Dict:
+        """Serialize the mutable parts of the session (version is stored separately)"""
+        return {
+            "conversation": self.conversation,
+            "profile": self.profile,
+            "recommendations": self.recommendations,
+            "recommendations_message_count": self.recommendations_message_count,
+            "idempotency": self.idempotency,
+        }
+
+    @classmethod
+    def from_payload(cls, session_id: str, payload: Dict, version: int, updated_at: float) -> "SessionState":
+        """Rebuild a session from its serialized payload"""
+        return cls(
+            session_id=session_id,
+            conversation=payload.get("conversation", []),
+            profile=payload.get("profile", {}),
+            recommendations=payload.get("recommendations"),
+            recommendations_message_count=payload.get("recommendations_message_count", -1),
+            idempotency=payload.get("idempotency", {}),
+            version=version,
+            updated_at=updated_at,
+        )
+
+
+class StateBackend(ABC):
+    """Storage for per-session state with optimistic versioning.
+
+    `save` only succeeds if the stored version still matches `state.version`,
+    so two workers serving the same session can't silently overwrite each other.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str) -> SessionState:
+        """Load a session, returning an empty version-0 state if it doesn't exist"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, state: SessionState, updated_at: Optional[float] = None) -> SessionState:
+        """Persist a session, raising VersionConflictError if it changed since load.
+
+        `updated_at` defaults to now; imports pass the original timestamp to keep it.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a session entirely"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_sessions(
+        self, since: Optional[float] = None, until: Optional[float] = None, batch_size: int = 100
+    ) -> Iterator[SessionState]:
+        """Yield sessions last updated in [since, until), oldest first, loading `batch_size` at a time"""
+        raise NotImplementedError
+
+    def update(
+        self,
+        session_id: str,
+        mutate: Callable[[SessionState], None],
+        retries: int = 10,
+        updated_at: Optional[float] = None,
+    ) -> SessionState:
+        """Load, mutate and save a session, retrying the mutation on version conflicts.
+
+        `mutate` may run more than once, so it must not have side effects (no LLM calls).
+        """
+        with span("state_update"):
+            for _ in range(retries):
+                state = self.load(session_id)
+                mutate(state)
+                try:
+                    return self.save(state, updated_at)
+                except VersionConflictError:
+                    continue
+        raise VersionConflictError(f"Too many concurrent updates to session {session_id}")
+
+
+class InMemoryStateBackend(StateBackend):
+    """Process-local backend, equivalent to the old module globals (single worker only)"""
+
+    def __init__(self):
+        self._sessions: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> SessionState:
+        with self._lock:
+            stored = self._sessions.get(session_id)
+        if stored is None:
+            return SessionState(session_id=session_id)
+        payload, version, updated_at = stored
+        # Round-trip through JSON so callers never mutate the stored copy
+        return SessionState.from_payload(session_id, json.loads(payload), version, updated_at)
+
+    def save(self, state: SessionState, updated_at: Optional[float] = None) -> SessionState:
+        payload = json.dumps(state.to_payload())
+        with self._lock:
+            stored = self._sessions.get(state.session_id)
+            current_version = stored[1] if stored else 0
+            if current_version != state.version:
+                raise VersionConflictError(f"Session {state.session_id} was modified concurrently")
+            state.version += 1
+            state.updated_at = updated_at if updated_at is not None else time.time()
+            self._sessions[state.session_id] = (payload, state.version, state.updated_at)
+        return state
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def iter_sessions(
+        self, since: Optional[float] = None, until: Optional[float] = None, batch_size: int = 100
+    ) -> Iterator[SessionState]:
+        with self._lock:
+            matching = sorted(
+                (updated_at, session_id)
+                for session_id, (_, _, updated_at) in self._sessions.items()
+                if (since is None or updated_at >= since) and (until is None or updated_at < until)
+            )
+        for _, session_id in matching:
+            state = self.load(session_id)
+            if state.version:  # Skip sessions deleted since the snapshot
+                yield state
+
+
+class SQLiteStateBackend(StateBackend):
+    """SQLite backend in WAL mode, shareable by several worker processes on one host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # Covers the keyset pagination in iter_sessions so each page is an index range scan
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at, session_id)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str) -> SessionState:
+        row = (
+            self._connection()
+            .execute("SELECT payload, version, updated_at FROM sessions WHERE session_id = ?", (session_id,))
+            .fetchone()
+        )
+        if row is None:
+            return SessionState(session_id=session_id)
+        payload, version, updated_at = row
+        return SessionState.from_payload(session_id, json.loads(payload), version, updated_at)
+
+    def save(self, state: SessionState, updated_at: Optional[float] = None) -> SessionState:
+        payload = json.dumps(state.to_payload())
+        if updated_at is None:
+            updated_at = time.time()
+        conn = self._connection()
+        if state.version == 0:
+            cursor = conn.execute(
+                "INSERT INTO sessions (session_id, payload, version, updated_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(session_id) DO NOTHING",
+                (state.session_id, payload, updated_at),
+            )
+        else:
+            cursor = conn.execute(
+                "UPDATE sessions SET payload = ?, version = version + 1, updated_at = ? "
+                "WHERE session_id = ? AND version = ?",
+                (payload, updated_at, state.session_id, state.version),
+            )
+        if cursor.rowcount == 0:
+            raise VersionConflictError(f"Session {state.session_id} was modified concurrently")
+        state.version += 1
+        state.updated_at = updated_at
+        return state
+
+    def delete(self, session_id: str) -> None:
+        self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def iter_sessions(
+        self, since: Optional[float] = None, until: Optional[float] = None, batch_size: int = 100
+    ) -> Iterator[SessionState]:
+        # Keyset pagination: each batch is its own query, so the generator holds no cursor
+        # and can be resumed from whichever thread iterates it next
+        last_key = (since if since is not None else float("-inf"), "")
+        while True:
+            rows = (
+                self._connection()
+                .execute(
+                    "SELECT session_id, payload, version, updated_at FROM sessions "
+                    "WHERE (updated_at, session_id) > (?, ?) AND updated_at < ? "
+                    "ORDER BY updated_at, session_id LIMIT ?",
+                    (last_key[0], last_key[1], until if until is not None else float("inf"), batch_size),
+                )
+                .fetchall()
+            )
+            for session_id, payload, version, updated_at in rows:
+                yield SessionState.from_payload(session_id, json.loads(payload), version, updated_at)
+            if len(rows) < batch_size:
+                return
+            last_key = (rows[-1][3], rows[-1][0])
+
+
+def create_state_backend() -> StateBackend:
+    """Build the backend selected by the STATE_BACKEND environment variable"""
+    backend = os.getenv("STATE_BACKEND", "memory").lower()
+    if backend == "memory":
+        return InMemoryStateBackend()
+    if backend == "sqlite":
+        return SQLiteStateBackend(os.getenv("STATE_SQLITE_PATH", "vibes_state.db"))
+    raise ValueError(f"Unknown STATE_BACKEND: {backend}")
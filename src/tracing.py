@@ -0,0 +1,141 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+
+class Trace:
+    """Stage timings collected while serving one request"""
+
+    def __init__(self, method: str, path: str):
+        self.request_id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.spans: List[Tuple[str, float]] = []
+        self.duration_ms = 0.0
+        self.status_code: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, duration_ms: float):
+        # Spans can be recorded from threadpool workers as well as the event loop
+        with self._lock:
+            self.spans.append((name, duration_ms))
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Total milliseconds per stage name, in first-seen order"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for name, duration_ms in self.spans:
+                totals[name] = totals.get(name, 0.0) + duration_ms
+        return totals
+
+    def server_timing(self) -> str:
+        """Format the stages as a Server-Timing header value"""
+        metrics = [f"{name};dur={duration_ms:.1f}" for name, duration_ms in self.stage_totals().items()]
+        metrics.append(f"total;dur={self.duration_ms:.1f}")
+        return ", ".join(metrics)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = [{"stage": name, "ms": round(duration_ms, 1)} for name, duration_ms in self.spans]
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 1),
+            "spans": spans,
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """Time a stage of the current request (no-op outside a traced request)"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, (time.perf_counter() - started) * 1000)
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    """Emit a single-line JSON log record tagged with the current request id"""
+    trace = _current_trace.get()
+    record = {"event": event, "request_id": trace.request_id if trace else None, **fields}
+    logger.log(level, json.dumps(record, default=str))
+
+
+class SlowRequestLog:
+    """Keeps the slowest `size` requests seen so far, with their stage breakdown"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._heap: List[Tuple[float, str, Dict]] = []  # Min-heap, so the fastest kept request is evicted first
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace):
+        entry = (trace.duration_ms, trace.request_id, trace.to_dict())
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif trace.duration_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def slowest(self) -> List[Dict]:
+        with self._lock:
+            return [entry[2] for entry in sorted(self._heap, reverse=True)]
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+
+
+logger = logging.getLogger(__name__)
+slow_requests = SlowRequestLog(size=int(os.getenv("SLOW_REQUEST_LOG_SIZE", "50")))
+
+
+async def tracing_middleware(request, call_next):
+    """Trace each request, add Server-Timing to the response and log its stage breakdown"""
+    trace = Trace(request.method, request.url.path)
+    token = _current_trace.set(trace)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        trace.duration_ms = (time.perf_counter() - started) * 1000
+        _current_trace.reset(token)
+
+    trace.status_code = response.status_code
+    response.headers["Server-Timing"] = trace.server_timing()
+    response.headers["X-Request-Id"] = trace.request_id
+    slow_requests.record(trace)
+    log_event(
+        logger,
+        "request_completed",
+        request_id=trace.request_id,
+        method=trace.method,
+        path=trace.path,
+        status_code=trace.status_code,
+        duration_ms=round(trace.duration_ms, 1),
+        stages={name: round(ms, 1) for name, ms in trace.stage_totals().items()},
+    )
+    return response
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from src.admission import AdmissionController, AdmissionRejected, Priority
+
+
+def run_queued(jobs, max_in_flight=1, slo_seconds=100.0):
+    """Queue (session_id, name, priority) jobs behind one held slot, release it, and return the admission order"""
+
+    async def scenario():
+        controller = AdmissionController(max_in_flight=max_in_flight, slo_seconds=slo_seconds)
+        order = []
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit("holder"):
+                await release.wait()
+
+        async def job(session_id, name, priority):
+            async with controller.admit(session_id, priority):
+                order.append(name)
+
+        tasks = [asyncio.create_task(hold())]
+        for session_id, name, priority in jobs:
+            tasks.append(asyncio.create_task(job(session_id, name, priority)))
+            await asyncio.sleep(0)  # Let each job enqueue before the next
+        release.set()
+        await asyncio.gather(*tasks)
+        return order, controller
+
+    return asyncio.run(scenario())
+
+
+def test_admits_immediately_below_cap():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=2, slo_seconds=10)
+        async with controller.admit("a"):
+            async with controller.admit("b"):
+                assert controller.snapshot()["in_flight"] == 2
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.snapshot()["in_flight"] == 0
+    assert controller.metrics.admitted["interactive"] == 2
+
+
+def test_interactive_is_admitted_before_background():
+    order, _ = run_queued(
+        [
+            ("a", "background", Priority.BACKGROUND),
+            ("b", "interactive", Priority.INTERACTIVE),
+        ]
+    )
+    assert order == ["interactive", "background"]
+
+
+def test_sessions_are_served_round_robin():
+    order, _ = run_queued(
+        [
+            ("a", "a1", Priority.INTERACTIVE),
+            ("a", "a2", Priority.INTERACTIVE),
+            ("a", "a3", Priority.INTERACTIVE),
+            ("b", "b1", Priority.INTERACTIVE),
+        ]
+    )
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_rejects_when_estimated_wait_exceeds_slo():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, slo_seconds=1, initial_service_time=5)
+        async with controller.admit("a"):
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with controller.admit("b"):
+                    pass
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(scenario())
+    assert rejected.retry_after >= 1
+    assert controller.metrics.rejected["interactive"] == 1
+    assert controller.queue_depth() == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, slo_seconds=100)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit("holder"):
+                await release.wait()
+
+        async def wait_for_slot():
+            async with controller.admit("b"):
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(wait_for_slot())
+        await asyncio.sleep(0)
+        assert controller.queue_depth() == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.queue_depth() == 0
+        release.set()
+        await holder
+        return controller
+
+    assert asyncio.run(scenario()).snapshot()["in_flight"] == 0
+
+
+def test_slot_handed_to_cancelled_waiter_is_released():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, slo_seconds=100)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit("holder"):
+                await release.wait()
+
+        async def wait_for_slot():
+            async with controller.admit("b"):
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(wait_for_slot())
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.sleep(0)
+        # The holder has handed its slot to the waiter, which is cancelled before it runs
+        assert controller.queue_depth() == 0
+        assert controller.snapshot()["in_flight"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await holder
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.snapshot()["in_flight"] == 0
+    assert controller.queue_depth() == 0
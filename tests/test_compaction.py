@@ -0,0 +1,87 @@
+from src.compaction import (
+    EVIDENCE_PER_TRAIT,
+    EVIDENCE_PREFIX,
+    add_evidence,
+    estimate_tokens,
+    is_near_duplicate,
+    merge_bio,
+)
+
+
+def test_near_duplicate_ignores_case_and_punctuation():
+    assert is_near_duplicate("Likes robots", "likes robots!")
+
+
+def test_near_duplicate_matches_whole_word_containment():
+    assert is_near_duplicate("Loves art", "Loves art and music")
+
+
+def test_partial_word_is_not_a_duplicate():
+    assert not is_near_duplicate("Loves art", "Loves artificial intelligence research")
+
+
+def test_different_numbers_are_different_facts():
+    assert not is_near_duplicate("I am 16", "I am 61")
+    assert not is_near_duplicate("I am 16 years old and live in Leeds", "I am 17 years old and live in Leeds")
+
+
+def test_negated_statements_are_different_facts():
+    assert not is_near_duplicate("I want to become a doctor", "I do not want to become a doctor")
+    assert not is_near_duplicate("I like maths and physics at school", "I don't like maths and physics at school")
+    assert not is_near_duplicate("Has been to France", "Has never been to France")
+
+
+def test_short_fragments_with_different_words_are_kept():
+    assert not is_near_duplicate("likes teams", "likes data")
+
+
+def test_merge_bio_keeps_distinct_facts():
+    bio = merge_bio("Loves art", "Loves artificial intelligence research")
+    assert bio == "Loves art. Loves artificial intelligence research"
+
+
+def test_merge_bio_replaces_repeats_with_newer_wording():
+    bio = merge_bio("Likes robots. Plays violin", "likes robots. Plays violin in the orchestra")
+    assert bio == "likes robots. Plays violin in the orchestra"
+
+
+def test_merge_bio_keeps_a_statement_and_its_negation():
+    bio = merge_bio(
+        "I want to become a doctor when I grow up and live in Leeds",
+        "I do not want to become a doctor when I grow up and live in Leeds",
+    )
+    assert bio == (
+        "I want to become a doctor when I grow up and live in Leeds. "
+        "I do not want to become a doctor when I grow up and live in Leeds"
+    )
+
+
+def test_merge_bio_keeps_newer_shorter_correction():
+    bio = merge_bio("Lives in Leeds with family and two dogs and a cat", "Lives in Leeds with family and two dogs")
+    assert bio == "Lives in Leeds with family and two dogs"
+
+
+def test_merge_bio_stays_under_token_cap():
+    bio = None
+    for i in range(50):
+        bio = merge_bio(bio, f"Fact {i} about a different hobby", max_tokens=40)
+    assert estimate_tokens(bio) <= 40
+    assert bio.endswith("Fact 49 about a different hobby")
+
+
+def test_add_evidence_compares_without_prefix():
+    evidence = add_evidence([f"{EVIDENCE_PREFIX}likes teams"], "likes data")
+    assert evidence == [f"{EVIDENCE_PREFIX}likes teams", f"{EVIDENCE_PREFIX}likes data"]
+
+
+def test_add_evidence_skips_repeats():
+    evidence = add_evidence([f"{EVIDENCE_PREFIX}talks about friends a lot"], "Talks about friends a lot!")
+    assert evidence == [f"{EVIDENCE_PREFIX}talks about friends a lot"]
+
+
+def test_add_evidence_keeps_most_recent_entries():
+    evidence = []
+    for topic in ["music", "sport", "coding", "cooking"]:
+        evidence = add_evidence(evidence, f"talks about {topic}")
+    assert len(evidence) == EVIDENCE_PER_TRAIT
+    assert evidence[-1] == f"{EVIDENCE_PREFIX}talks about cooking"
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import pytest
+
+from src.idempotency import (
+    IdempotencyKeyMismatch,
+    IdempotencyStore,
+    check_key,
+    claim_key,
+    complete_key,
+    release_key,
+    renew_key,
+)
+from src.service import MentorService, state_backend
+from src.state import SessionState
+
+FINGERPRINT = ["mentor", "hi"]
+
+
+def test_claim_then_replay():
+    session = SessionState(session_id="s")
+    assert claim_key(session, "k", FINGERPRINT) == ("claimed", None)
+    assert check_key(session, "k", FINGERPRINT) == ("pending", None)
+    complete_key(session, "k", "Hello!")
+    assert check_key(session, "k", FINGERPRINT) == ("done", "Hello!")
+    assert claim_key(session, "k", FINGERPRINT) == ("done", "Hello!")
+
+
+def test_reused_key_with_different_request_is_rejected():
+    session = SessionState(session_id="s")
+    claim_key(session, "k", FINGERPRINT)
+    with pytest.raises(IdempotencyKeyMismatch):
+        check_key(session, "k", ["mentor", "something else"])
+
+
+def test_released_claim_can_be_claimed_again():
+    session = SessionState(session_id="s")
+    claim_key(session, "k", FINGERPRINT)
+    release_key(session, "k")
+    assert claim_key(session, "k", FINGERPRINT) == ("claimed", None)
+
+
+def test_release_keeps_finished_reply():
+    session = SessionState(session_id="s")
+    claim_key(session, "k", FINGERPRINT)
+    complete_key(session, "k", "Hello!")
+    release_key(session, "k")
+    assert check_key(session, "k", FINGERPRINT) == ("done", "Hello!")
+
+
+def test_lapsed_lease_can_be_taken_over_and_renewal_prevents_it():
+    session = SessionState(session_id="s")
+    claim_key(session, "k", FINGERPRINT)
+    session.idempotency["k"]["lease_expires_at"] = time.time() - 1
+    assert check_key(session, "k", FINGERPRINT) == ("claimable", None)
+
+    renew_key(session, "k")
+    assert check_key(session, "k", FINGERPRINT) == ("pending", None)
+
+
+def test_expired_keys_are_forgotten():
+    session = SessionState(session_id="s")
+    claim_key(session, "old", FINGERPRINT)
+    complete_key(session, "old", "Hello!")
+    session.idempotency["old"]["expires_at"] = time.time() - 1
+    assert check_key(session, "old", ["mentor", "new message"]) == ("claimable", None)
+    claim_key(session, "new", FINGERPRINT)
+    assert "old" not in session.idempotency
+
+
+def test_replay_does_not_write_the_session():
+    session_id = "idempotency-replay"
+    assert MentorService.claim_idempotency_key(session_id, "k", FINGERPRINT) == ("claimed", None)
+    state_backend.update(session_id, lambda session: complete_key(session, "k", "Hello!"))
+    version = state_backend.load(session_id).version
+
+    assert MentorService.claim_idempotency_key(session_id, "k", FINGERPRINT) == ("done", "Hello!")
+    assert state_backend.load(session_id).version == version
+    state_backend.delete(session_id)
+
+
+def test_store_runs_concurrent_retries_once():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "Hello!"
+
+    async def scenario():
+        store = IdempotencyStore(max_entries=10, ttl_seconds=60)
+        first, second = await asyncio.gather(store.run("k", "fp", compute), store.run("k", "fp", compute))
+        later = await store.run("k", "fp", compute)
+        return first, second, later
+
+    first, second, later = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert first == ("Hello!", False)
+    assert second == ("Hello!", True)
+    assert later == ("Hello!", True)
+
+
+def test_store_does_not_keep_failures():
+    attempts = []
+
+    async def compute():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return "Hello!"
+
+    async def scenario():
+        store = IdempotencyStore(max_entries=10, ttl_seconds=60)
+        with pytest.raises(RuntimeError):
+            await store.run("k", "fp", compute)
+        return await store.run("k", "fp", compute)
+
+    assert asyncio.run(scenario()) == ("Hello!", False)
+    assert len(attempts) == 2
+
+
+def test_store_rejects_reused_key_with_different_request():
+    async def compute():
+        return "Hello!"
+
+    async def scenario():
+        store = IdempotencyStore(max_entries=10, ttl_seconds=60)
+        await store.run("k", "fp", compute)
+        with pytest.raises(IdempotencyKeyMismatch):
+            await store.run("k", "other", compute)
+
+    asyncio.run(scenario())
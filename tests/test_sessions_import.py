@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from src.service import MentorService, state_backend
+
+CONVERSATION = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello!"}]
+
+
+@pytest.fixture
+def session_id():
+    yield "import-test"
+    state_backend.delete("import-test")
+
+
+def test_import_restores_session_and_updated_at(session_id):
+    record = {
+        "session_id": session_id,
+        "updated_at": 1000.0,
+        "conversation": CONVERSATION,
+        "profile": {"name": "Sam", "personality_scores": {"decision_lens": 7.5}},
+    }
+    assert MentorService.import_sessions([record]) == 1
+
+    state = state_backend.load(session_id)
+    assert state.conversation == CONVERSATION
+    assert state.profile["name"] == "Sam"
+    assert state.profile["personality_scores"]["decision_lens"] == 7.5
+    assert state.updated_at == 1000.0
+
+
+def test_export_round_trips_through_import(session_id):
+    MentorService.import_sessions([{"session_id": session_id, "updated_at": 1000.0, "conversation": CONVERSATION}])
+    exported = [json.loads(line) for line in MentorService.export_sessions(since=1000.0, until=1000.5)]
+    assert [record["session_id"] for record in exported] == [session_id]
+
+    state_backend.delete(session_id)
+    MentorService.import_sessions(exported)
+    assert state_backend.load(session_id).conversation == CONVERSATION
+
+
+@pytest.mark.parametrize(
+    "record",
+    [
+        [1, 2],
+        {"conversation": []},
+        {"session_id": 5},
+        {"session_id": "x", "updated_at": "yesterday"},
+        {"session_id": "x", "conversation": "oops"},
+        {"session_id": "x", "conversation": [{"role": "system", "content": "hi"}]},
+        {"session_id": "x", "conversation": [{"role": "user", "content": None}]},
+        {"session_id": "x", "profile": None},
+        {"session_id": "x", "profile": {"name": 3}},
+        {"session_id": "x", "profile": {"personality_scores": {"bogus": 3}}},
+        {"session_id": "x", "profile": {"personality_scores": {"decision_lens": 11}}},
+        {"session_id": "x", "profile": {"trait_evidence": {"decision_lens": "likes data"}}},
+        {"session_id": "x", "profile": {"last_update_message_count": "2"}},
+    ],
+)
+def test_import_rejects_malformed_records(record):
+    with pytest.raises(ValueError):
+        MentorService.import_sessions([record])
+    assert state_backend.load("x").version == 0
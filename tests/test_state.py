@@ -0,0 +1,76 @@
+import pytest
+
+from src.state import InMemoryStateBackend, SQLiteStateBackend, VersionConflictError
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryStateBackend()
+    return SQLiteStateBackend(str(tmp_path / "state.db"))
+
+
+def test_load_missing_session_is_empty(backend):
+    state = backend.load("s")
+    assert state.version == 0
+    assert state.conversation == []
+
+
+def test_save_bumps_version(backend):
+    state = backend.load("s")
+    state.conversation.append({"role": "user", "content": "hi"})
+    backend.save(state)
+    loaded = backend.load("s")
+    assert loaded.version == 1
+    assert loaded.conversation == [{"role": "user", "content": "hi"}]
+
+
+def test_stale_save_conflicts(backend):
+    first, second = backend.load("s"), backend.load("s")
+    backend.save(first)
+    with pytest.raises(VersionConflictError):
+        backend.save(second)
+
+    first, second = backend.load("s"), backend.load("s")
+    backend.save(first)
+    with pytest.raises(VersionConflictError):
+        backend.save(second)
+
+
+def test_update_retries_mutation_after_conflict(backend):
+    def mutate(state):
+        state.conversation.append({"role": "user", "content": "mine"})
+        if len(attempts) == 0:
+            # Another worker writes between this load and save
+            other = backend.load("s")
+            other.conversation.append({"role": "user", "content": "theirs"})
+            backend.save(other)
+        attempts.append(state.version)
+
+    attempts = []
+    state = backend.update("s", mutate)
+    assert attempts == [0, 1]
+    assert [m["content"] for m in state.conversation] == ["theirs", "mine"]
+
+
+def test_save_keeps_given_updated_at(backend):
+    state = backend.update("s", lambda state: None, updated_at=1000.0)
+    assert state.updated_at == 1000.0
+    assert backend.load("s").updated_at == 1000.0
+
+
+def test_delete(backend):
+    backend.update("s", lambda state: state.conversation.append({"role": "user", "content": "hi"}))
+    backend.delete("s")
+    assert backend.load("s").version == 0
+
+
+def test_iter_sessions_pages_through_ties_in_order(backend):
+    for i in range(7):
+        backend.update(f"s{i}", lambda state: None, updated_at=100.0 + i // 3)
+    assert [state.session_id for state in backend.iter_sessions(batch_size=2)] == [f"s{i}" for i in range(7)]
+    assert [state.session_id for state in backend.iter_sessions(since=101.0, until=102.0, batch_size=2)] == [
+        "s3",
+        "s4",
+        "s5",
+    ]